@@ -0,0 +1,61 @@
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+
+import server
+
+
+class _Cursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    async def to_list(self, length=None):
+        return self.docs[:length]
+
+
+class _Cards:
+    def __init__(self, docs):
+        self.docs = docs
+
+    async def aggregate(self, pipeline):
+        return _Cursor(self.docs)
+
+
+@pytest.fixture
+def cards(monkeypatch):
+    docs = [
+        {"_id": "c1", "title": "Sunday meal prep", "created_at": "2026-01-01T00:00:00+00:00"},
+        {"_id": "c2", "title": "Free jazz night", "created_at": "2026-01-02T00:00:00+00:00"},
+    ]
+    monkeypatch.setattr(server, "db", SimpleNamespace(experience_cards=_Cards(docs)))
+    # Plain TestClient (no context manager) so lifespan does not try to reach MongoDB
+    return docs, TestClient(server.app)
+
+
+def test_first_fetch_returns_etag_and_no_cache(cards):
+    _, client = cards
+    resp = client.get("/api/placer/cards", params={"user_id": "u1"})
+    assert resp.status_code == 200
+    assert [c["id"] for c in resp.json()] == ["c1", "c2"]
+    assert resp.headers["etag"].startswith('"')
+    assert resp.headers["cache-control"] == "private, no-cache"
+
+
+def test_matching_if_none_match_returns_304(cards):
+    _, client = cards
+    etag = client.get("/api/placer/cards", params={"user_id": "u1"}).headers["etag"]
+    resp = client.get("/api/placer/cards", params={"user_id": "u1"}, headers={"If-None-Match": etag})
+    assert resp.status_code == 304
+    assert resp.content == b""
+    assert resp.headers["etag"] == etag
+
+
+def test_swipe_changes_etag(cards):
+    docs, client = cards
+    etag = client.get("/api/placer/cards", params={"user_id": "u1"}).headers["etag"]
+    # Same size and last created_at, different card: the ids keep the ETag honest
+    docs[0] = {"_id": "c3", "title": "Park run", "created_at": "2026-01-01T00:00:00+00:00"}
+    resp = client.get("/api/placer/cards", params={"user_id": "u1"}, headers={"If-None-Match": etag})
+    assert resp.status_code == 200
+    assert resp.headers["etag"] != etag
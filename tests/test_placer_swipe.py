@@ -0,0 +1,62 @@
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+
+import server
+
+
+class _Cards:
+    """experience_cards collection honouring the not-yet-swiped filter."""
+
+    def __init__(self, docs):
+        self.docs = {d["_id"]: d for d in docs}
+
+    def _match(self, query):
+        doc = self.docs.get(query["_id"])
+        if doc is None or doc["user_id"] != query["user_id"]:
+            return None
+        if "swipes_inline" in query and "swipes_inline" in doc:
+            return None
+        return doc
+
+    async def find_one(self, query, projection=None):
+        doc = self._match(query)
+        return {"_id": doc["_id"]} if doc else None
+
+    async def find_one_and_update(self, query, update, projection=None):
+        doc = self._match(query)
+        if doc is None:
+            return None
+        for field, value in update["$push"].items():
+            doc.setdefault(field, []).append(value)
+        return {"_id": doc["_id"]}
+
+
+@pytest.fixture
+def client(monkeypatch):
+    cards = _Cards([{"_id": "c1", "user_id": "u1"}])
+    monkeypatch.setattr(server, "db", SimpleNamespace(experience_cards=cards))
+    # Plain TestClient (no context manager) so lifespan does not try to reach MongoDB
+    return TestClient(server.app)
+
+
+def _swipe(client, user_id="u1", card_id="c1", direction="right"):
+    return client.post("/api/placer/swipe", json={"user_id": user_id, "card_id": card_id, "direction": direction})
+
+
+def test_first_swipe_is_recorded(client):
+    resp = _swipe(client)
+    assert resp.status_code == 200
+    assert resp.json()["direction"] == "right"
+
+
+def test_repeat_swipe_conflicts(client):
+    assert _swipe(client).status_code == 200
+    resp = _swipe(client, direction="left")
+    assert resp.status_code == 409
+
+
+def test_unknown_or_foreign_card_not_found(client):
+    assert _swipe(client, card_id="missing").status_code == 404
+    assert _swipe(client, user_id="u2").status_code == 404
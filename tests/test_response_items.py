@@ -0,0 +1,48 @@
+import pytest
+from pydantic import ValidationError
+
+from server import _response_items
+
+
+@pytest.mark.parametrize("content", [
+    b'{"items": [{"title": "Sunday meal prep", "confidence": 0.8}]}',
+    b'{"experiences": [{"title": "Sunday meal prep", "confidence": 0.8}]}',
+    b'[{"title": "Sunday meal prep", "confidence": 0.8}]',
+])
+def test_accepts_all_three_shapes(content):
+    items = _response_items(content)
+    assert [(it.title, it.confidence) for it in items] == [("Sunday meal prep", 0.8)]
+
+
+def test_items_wins_when_both_keys_present():
+    items = _response_items(b'{"items": [{"title": "a"}], "experiences": [{"title": "b"}]}')
+    assert [it.title for it in items] == ["a"]
+
+
+def test_defaults_and_null_fields():
+    item = _response_items(b'{"items": [{"title": null, "description": null}]}')[0]
+    assert item.title == ""
+    assert item.description == ""
+    defaults = _response_items(b'{"items": [{}]}')[0]
+    assert defaults.title == "Untitled"
+    assert defaults.confidence == 0.6
+
+
+def test_numeric_string_confidence_is_coerced():
+    assert _response_items(b'[{"title": "a", "confidence": "0.7"}]')[0].confidence == 0.7
+
+
+@pytest.mark.parametrize("content", [
+    b'{"foo": []}',
+    b'{"items": "not a list"}',
+    b'{"items": [{"title": "a", "confidence": "high"}]}',
+    b'"just a string"',
+])
+def test_rejects_unusable_shapes(content):
+    with pytest.raises(ValidationError):
+        _response_items(content)
+
+
+def test_rejects_truncated_json():
+    with pytest.raises(ValueError):
+        _response_items(b'{"items": [{"title": "a"')
@@ -0,0 +1,126 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import server
+
+
+class _FakeUsers:
+    def __init__(self, *user_ids):
+        self.docs = {u: {"_id": u} for u in user_ids}
+
+    async def find_one(self, query, projection=None):
+        doc = self.docs.get(query["_id"])
+        return dict(doc) if doc is not None else None
+
+    async def update_one(self, query, update):
+        doc = self.docs[query["_id"]]
+        matched = doc.get("user_bloom_v") == query["user_bloom_v"]
+        if matched:
+            doc.update(update["$set"])
+        return SimpleNamespace(matched_count=int(matched))
+
+
+class _FakeCards:
+    def __init__(self):
+        self.docs = []
+
+    def find(self, query, projection=None):
+        async def cursor():
+            for d in list(self.docs):
+                if d["user_id"] == query["user_id"]:
+                    yield d
+        return cursor()
+
+    async def insert_many(self, docs, **kwargs):
+        self.docs.extend(docs)
+
+
+class _FakeBatches:
+    """suggest_batches collection honouring the unclaimed-or-expired claim filter."""
+
+    def __init__(self, *batch_ids):
+        self.docs = {b: {"_id": b} for b in batch_ids}
+
+    async def find_one_and_update(self, query, update):
+        doc = self.docs.get(query["_id"])
+        if doc is None or "collecting" in doc:
+            return None
+        before = dict(doc)
+        doc.update(update["$set"])
+        return before
+
+    async def update_one(self, query, update):
+        for field in update.get("$unset", {}):
+            self.docs[query["_id"]].pop(field, None)
+
+    async def delete_one(self, query):
+        self.docs.pop(query["_id"], None)
+
+
+def _output_line(user_id, titles, status_code=200):
+    content = json.dumps({"items": [{"title": t} for t in titles]})
+    body = {"choices": [{"message": {"content": content}}]}
+    return json.dumps({"custom_id": user_id, "response": {"status_code": status_code, "body": body}})
+
+
+def _install(monkeypatch, lines):
+    downloads = []
+
+    async def retrieve(batch_id):
+        await asyncio.sleep(0)  # let an overlapping collector reach its claim
+        return SimpleNamespace(status="completed", output_file_id="file-1")
+
+    async def content(file_id):
+        downloads.append(file_id)
+        return SimpleNamespace(content="\n".join(lines).encode())
+
+    monkeypatch.setattr(server, "openai_client", SimpleNamespace(
+        batches=SimpleNamespace(retrieve=retrieve),
+        files=SimpleNamespace(content=content),
+    ))
+    db = SimpleNamespace(
+        users=_FakeUsers("a", "b"),
+        experience_cards=_FakeCards(),
+        suggest_batches=_FakeBatches("batch-1"),
+        downloads=downloads,
+    )
+    monkeypatch.setattr(server, "db", db)
+    return db
+
+
+def test_collect_stores_each_users_cards(monkeypatch):
+    db = _install(monkeypatch, [
+        _output_line("a", ["Park run", "Pottery class"]),
+        _output_line("b", ["Ignored"], status_code=500),
+        _output_line("gone", ["No such user"]),
+    ])
+    asyncio.run(server.collect_suggest_batch("batch-1"))
+
+    assert sorted((d["user_id"], d["title"]) for d in db.experience_cards.docs) == [
+        ("a", "Park run"), ("a", "Pottery class"),
+    ]
+    assert db.suggest_batches.docs == {}
+
+
+def test_concurrent_collectors_store_once(monkeypatch):
+    db = _install(monkeypatch, [_output_line("a", ["Park run"])])
+
+    async def main():
+        await asyncio.gather(
+            server.collect_suggest_batch("batch-1"),
+            server.collect_suggest_batch("batch-1"),
+        )
+
+    asyncio.run(main())
+    assert db.downloads == ["file-1"]
+    assert [d["title"] for d in db.experience_cards.docs] == ["Park run"]
+
+
+def test_failed_collect_releases_claim(monkeypatch):
+    db = _install(monkeypatch, ["not json"])
+    try:
+        asyncio.run(server.collect_suggest_batch("batch-1"))
+    except ValueError:
+        pass
+    assert db.suggest_batches.docs == {"batch-1": {"_id": "batch-1"}}
@@ -0,0 +1,21 @@
+import pytest
+
+from server import SUGGEST_SYSTEM_PROMPT
+
+# OpenAI only caches prompt prefixes of 1024+ tokens. English prose and JSON average
+# fewer than 5 characters per token, so this floor keeps the prompt at least 25% above
+# the threshold without needing a tokenizer download.
+MIN_PROMPT_CHARS = int(5 * 1024 * 1.25)
+
+
+def test_system_prompt_clears_cache_threshold_by_length():
+    assert len(SUGGEST_SYSTEM_PROMPT) >= MIN_PROMPT_CHARS
+
+
+def test_system_prompt_clears_cache_threshold_by_tokens():
+    tiktoken = pytest.importorskip("tiktoken")
+    try:
+        encoding = tiktoken.get_encoding("o200k_base")
+    except Exception:
+        pytest.skip("o200k_base encoding is not available offline")
+    assert len(encoding.encode(SUGGEST_SYSTEM_PROMPT)) >= 1024 * 1.25
@@ -0,0 +1,151 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+import server
+from server import hashed_user_id, request_suggestions
+
+
+class _StubCompletions:
+    """Records every chat completion call and answers with respond(user_ids, call_index)."""
+
+    def __init__(self, respond):
+        self.respond = respond
+        self.calls = []
+
+    async def create(self, **kwargs):
+        prompt = kwargs["messages"][1]["content"]
+        if prompt.startswith("Profiles JSON:"):
+            user_ids = [p["user_id"] for p in json.loads(prompt.split("\n")[1])]
+        else:
+            user_ids = [_unhash[kwargs["user"]]]
+        self.calls.append(user_ids)
+        content = self.respond(user_ids, len(self.calls))
+        if isinstance(content, Exception):
+            raise content
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+_unhash = {hashed_user_id(u): u for u in ["a", "b", "c"]}
+
+
+def _items(user_id, call):
+    return [{"title": f"{user_id} card from call {call}"}]
+
+
+def _combined_ok(user_ids, call):
+    if len(user_ids) == 1:
+        return json.dumps({"items": _items(user_ids[0], call)})
+    return json.dumps({u: _items(u, call) for u in user_ids})
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    monkeypatch.setattr(server, "_suggest_queue", asyncio.Queue())
+
+    def install(respond):
+        completions = _StubCompletions(respond)
+        monkeypatch.setattr(server, "openai_client", SimpleNamespace(chat=SimpleNamespace(completions=completions)))
+        return completions
+
+    return install
+
+
+def _run(*user_ids, count=3):
+    async def main():
+        worker = asyncio.create_task(server._suggest_worker())
+        try:
+            return await asyncio.gather(
+                *(request_suggestions(u, {"count": count}) for u in user_ids),
+                return_exceptions=True,
+            )
+        finally:
+            worker.cancel()
+
+    return asyncio.run(main())
+
+
+def _titles(result):
+    return [it.title for it in result]
+
+
+def test_lone_request_uses_single_profile_call(stub):
+    completions = stub(_combined_ok)
+    (result,) = _run("a")
+    assert completions.calls == [["a"]]
+    assert _titles(result) == ["a card from call 1"]
+
+
+def test_concurrent_requests_share_one_call(stub):
+    completions = stub(_combined_ok)
+    a, b = _run("a", "b")
+    assert completions.calls == [["a", "b"]]
+    assert _titles(a) == ["a card from call 1"]
+    assert _titles(b) == ["b card from call 1"]
+
+
+def test_malformed_combined_response_retries_individually(stub):
+    def respond(user_ids, call):
+        if len(user_ids) > 1:
+            return '{"a": [{"title": "trunc'
+        return _combined_ok(user_ids, call)
+
+    completions = stub(respond)
+    a, b = _run("a", "b")
+    assert completions.calls[0] == ["a", "b"]
+    assert sorted(completions.calls[1:]) == [["a"], ["b"]]
+    assert _titles(a)[0].startswith("a card")
+    assert _titles(b)[0].startswith("b card")
+
+
+def test_missing_user_key_retries_only_that_user(stub):
+    def respond(user_ids, call):
+        if len(user_ids) > 1:
+            return json.dumps({"a": _items("a", call)})
+        return _combined_ok(user_ids, call)
+
+    completions = stub(respond)
+    a, b = _run("a", "b")
+    assert completions.calls == [["a", "b"], ["b"]]
+    assert _titles(a) == ["a card from call 1"]
+    assert _titles(b) == ["b card from call 2"]
+
+
+def test_api_error_fails_group_without_retries(stub):
+    def respond(user_ids, call):
+        return RuntimeError("rate limited")
+
+    completions = stub(respond)
+    a, b = _run("a", "b")
+    assert completions.calls == [["a", "b"]]
+    assert isinstance(a, RuntimeError) and isinstance(b, RuntimeError)
+
+
+def test_same_user_twice_goes_to_separate_calls(stub):
+    completions = stub(_combined_ok)
+    first_a, b, second_a = _run("a", "b", "a")
+    assert completions.calls == [["a", "b"], ["a"]]
+    assert _titles(first_a) != _titles(second_a)
+    assert _titles(b) == ["b card from call 1"]
+
+
+def test_batch_is_cut_by_requested_cards(stub, monkeypatch):
+    monkeypatch.setattr(server, "SUGGEST_BATCH_MAX_CARDS", 6)
+    completions = stub(_combined_ok)
+    results = _run("a", "b", "c", count=3)
+    assert completions.calls == [["a", "b"], ["c"]]
+    assert not any(isinstance(r, Exception) for r in results)
+
+
+def test_request_times_out_without_worker(monkeypatch):
+    monkeypatch.setattr(server, "_suggest_queue", asyncio.Queue())
+    monkeypatch.setattr(server, "suggestion_timeout", lambda count: 0.05)
+    with pytest.raises(TimeoutError):
+        asyncio.run(request_suggestions("a", {"count": 3}))
+
+
+def test_timeout_covers_full_batch_and_retry():
+    budget = server.suggestion_max_tokens([server.SUGGEST_BATCH_MAX_CARDS]) + server.suggestion_max_tokens([10])
+    assert server.suggestion_timeout(10) >= budget / server.SUGGEST_OUTPUT_TOKENS_PER_SEC
@@ -0,0 +1,99 @@
+import asyncio
+from types import SimpleNamespace
+
+import server
+from server import TitleBloom, save_title_bloom
+
+
+def test_added_titles_are_members():
+    bloom = TitleBloom()
+    titles = [f"title {i}" for i in range(500)]
+    for title in titles:
+        bloom.add(title)
+    assert all(title in bloom for title in titles)
+
+
+def test_false_positive_rate_at_capacity():
+    bloom = TitleBloom()
+    for i in range(TitleBloom.CAPACITY):
+        bloom.add(f"seen {i}")
+    false_positives = sum(f"unseen {i}" in bloom for i in range(20_000))
+    assert false_positives / 20_000 < TitleBloom.ERROR_RATE * 1.5
+
+
+def test_dumps_loads_round_trip():
+    bloom = TitleBloom()
+    bloom.add("evening league basketball")
+    restored = TitleBloom.loads(bloom.dumps(), version=3)
+    assert restored.bits == bloom.bits
+    assert restored.version == 3
+    assert "evening league basketball" in restored
+    assert "sunday meal prep" not in restored
+
+
+def test_merge_is_union():
+    a, b = TitleBloom(), TitleBloom()
+    a.add("first apartment lease")
+    b.add("community garden plot")
+    a.merge(b)
+    assert "first apartment lease" in a
+    assert "community garden plot" in a
+
+
+class _FakeUsers:
+    """Minimal users collection honouring the user_bloom_v compare-and-set filter."""
+
+    def __init__(self, doc):
+        self.doc = doc
+
+    async def update_one(self, query, update):
+        matched = self.doc.get("user_bloom_v") == query["user_bloom_v"]
+        if matched:
+            self.doc.update(update["$set"])
+        return SimpleNamespace(matched_count=int(matched))
+
+    async def find_one(self, query, projection=None):
+        return dict(self.doc)
+
+
+def test_save_merges_concurrent_writer(monkeypatch):
+    # Another request saved its own title since this filter was loaded
+    other = TitleBloom()
+    other.add("free jazz night downtown")
+    users = _FakeUsers({"_id": "u1", "user_bloom": other.dumps(), "user_bloom_v": 1})
+    monkeypatch.setattr(server, "db", SimpleNamespace(users=users))
+
+    bloom = TitleBloom()
+    bloom.add("sunday meal prep")
+    asyncio.run(save_title_bloom("u1", bloom))
+
+    assert users.doc["user_bloom_v"] == 2
+    saved = TitleBloom.loads(users.doc["user_bloom"])
+    assert "sunday meal prep" in saved
+    assert "free jazz night downtown" in saved
+
+
+class _FakeCards:
+    def __init__(self):
+        self.docs = []
+
+    async def insert_many(self, docs, **kwargs):
+        self.docs.extend(docs)
+        await asyncio.sleep(0)  # let an overlapping store run if nothing serializes them
+
+
+def test_overlapping_stores_for_one_user_do_not_duplicate_titles(monkeypatch):
+    users = _FakeUsers({"_id": "u1"})
+    cards = _FakeCards()
+    monkeypatch.setattr(server, "db", SimpleNamespace(users=users, experience_cards=cards))
+    items = server._CardListAdapter.validate_python([{"title": "Sunday meal prep"}, {"title": "Park run"}])
+
+    async def main():
+        # Both handlers loaded the (empty) filter before either stored
+        await asyncio.gather(
+            server.store_new_cards("u1", items, TitleBloom()),
+            server.store_new_cards("u1", items, TitleBloom()),
+        )
+
+    asyncio.run(main())
+    assert sorted(d["title"] for d in cards.docs) == ["Park run", "Sunday meal prep"]
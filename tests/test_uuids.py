@@ -0,0 +1,21 @@
+import uuid
+
+from server import _uuids
+
+
+def test_returns_requested_count():
+    assert _uuids(0) == []
+    assert len(_uuids(8)) == 8
+
+
+def test_ids_are_rfc4122_version_4():
+    for value in _uuids(64):
+        parsed = uuid.UUID(value)
+        assert str(parsed) == value
+        assert parsed.version == 4
+        assert parsed.variant == uuid.RFC_4122
+
+
+def test_ids_are_unique():
+    ids = _uuids(1000)
+    assert len(set(ids)) == len(ids)